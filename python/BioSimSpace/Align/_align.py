@@ -34,6 +34,8 @@ __all__ = [
 ]
 
 import csv as _csv
+import hashlib as _hashlib
+import json as _json
 import os as _os
 import subprocess as _subprocess
 import shutil as _shutil
@@ -93,6 +95,14 @@ else:
 
 from ._merge import merge as _merge
 
+# The directory used for the on-disk cache of atom mappings, and a version
+# stamp that is included in the cache key. Bump the version whenever the
+# matching or scoring logic changes so that stale mappings are ignored.
+_mapping_cache_dir = _os.path.join(
+    _os.path.expanduser("~"), ".cache", "BioSimSpace", "align"
+)
+_mapping_cache_version = 1
+
 try:
     _fkcombu_exe = _SireBase.findExe("fkcombu_bss").absoluteFilePath()
 except:
@@ -728,7 +738,8 @@ def matchAtoms(
     When requesting more than one match, the mappings will be sorted using
     a scoring function and returned in order of best to worst score. (Note
     that, depending on the scoring function the "best" score may have the
-    lowest value.).
+    lowest value.). Mappings can be cached on disk, in ~/.cache/BioSimSpace/align,
+    by setting the 'BSS_CACHE_ALIGN' environment variable to '1'.
 
     Parameters
     ----------
@@ -907,105 +918,132 @@ def matchAtoms(
             _Convert.toRDKit(mol0, property_map=property_map0),
             _Convert.toRDKit(mol1, property_map=property_map1),
         ]
-
-        # Generate the MCS match.
-        mcs = _rdFMCS.FindMCS(
-            mols,
-            atomCompare=_rdFMCS.AtomCompare.CompareAny,
-            bondCompare=_rdFMCS.BondCompare.CompareAny,
-            completeRingsOnly=complete_rings_only,
-            ringMatchesRingOnly=True,
-            matchChiralTag=False,
-            matchValences=False,
-            maximizeBonds=False,
-            timeout=timeout,
-        )
-
-        # Get the common substructure as a SMARTS string.
-        mcs_smarts = _Chem.MolFromSmarts(mcs.smartsString)
-
     except:
         raise RuntimeError("RDKIT MCS mapping failed!")
 
-    # Score the mappings and return them in sorted order (best to worst).
-    mappings, scores = _score_rdkit_mappings(
-        mol0,
-        mol1,
-        mols[0],
-        mols[1],
-        mcs_smarts,
-        prematch,
-        _scoring_function,
-        max_scoring_matches,
-        property_map0,
-        property_map1,
-    )
-
-    # Sometimes RDKit fails to generate a mapping that includes the prematch.
-    # If so, then try generating a mapping using the MCS routine from Sire.
-    if len(mappings) == 1 and mappings[0] == prematch:
-        # Warn that we've fallen back on using Sire.
-        if prematch != {}:
-            _warnings.warn("RDKit mapping didn't include prematch. Using Sire MCS.")
-
-        # Warn about unsupported options.
-        if not complete_rings_only:
-            _warnings.warn(
-                "Using Sire MCS. Ignoring unsupported 'complete_rings_only' option!"
-            )
-
-        # Convert timeout to a Sire Unit.
-        timeout = timeout * _SireUnits.second
-
-        # Regular match. Include light atoms, but don't allow matches between heavy
-        # and light atoms.
-        m0 = mol0.evaluate().findMCSmatches(
-            mol1,
-            _SireMol.AtomResultMatcher(_to_sire_mapping(prematch)),
+    # Check for a cached result if on-disk caching of mappings is enabled.
+    # Any failure to create the cache key, or to read the cache file, is
+    # treated as a cache miss, so that caching never causes matching to fail.
+    cache_file = None
+    mappings = None
+    try:
+        cache_file = _get_mapping_cache_file(
+            mols,
+            _scoring_function,
+            prematch,
             timeout,
-            True,
-            property_map0,
-            property_map1,
-            6,
-            False,
+            complete_rings_only,
+            max_scoring_matches,
         )
+        if cache_file is not None and _os.path.isfile(cache_file):
+            mappings, scores = _read_mapping_cache(cache_file)
+    except Exception:
+        mappings = None
 
-        # Include light atoms, and allow matches between heavy and light atoms.
-        # This captures mappings such as O --> H in methane to methanol.
-        m1 = mol0.evaluate().findMCSmatches(
-            mol1,
-            _SireMol.AtomResultMatcher(_to_sire_mapping(prematch)),
-            timeout,
-            True,
-            property_map0,
-            property_map1,
-            0,
-            False,
-        )
+    if mappings is None:
+        try:
+            # Generate the MCS match.
+            mcs = _rdFMCS.FindMCS(
+                mols,
+                atomCompare=_rdFMCS.AtomCompare.CompareAny,
+                bondCompare=_rdFMCS.BondCompare.CompareAny,
+                completeRingsOnly=complete_rings_only,
+                ringMatchesRingOnly=True,
+                matchChiralTag=False,
+                matchValences=False,
+                maximizeBonds=False,
+                timeout=timeout,
+            )
 
-        # Take the mapping with the larger number of matches.
-        if len(m1) > 0:
-            if len(m0) > 0:
-                if len(m1[0]) > len(m0[0]):
-                    mappings = m1
-                else:
-                    mappings = m0
-            else:
-                mappings = m1
-        else:
-            mappings = m0
+            # Get the common substructure as a SMARTS string.
+            mcs_smarts = _Chem.MolFromSmarts(mcs.smartsString)
+
+        except:
+            raise RuntimeError("RDKIT MCS mapping failed!")
 
         # Score the mappings and return them in sorted order (best to worst).
-        mappings, scores = _score_sire_mappings(
+        mappings, scores = _score_rdkit_mappings(
             mol0,
             mol1,
-            mappings,
+            mols[0],
+            mols[1],
+            mcs_smarts,
             prematch,
             _scoring_function,
+            max_scoring_matches,
             property_map0,
             property_map1,
         )
 
+        # Sometimes RDKit fails to generate a mapping that includes the prematch.
+        # If so, then try generating a mapping using the MCS routine from Sire.
+        if len(mappings) == 1 and mappings[0] == prematch:
+            # Warn that we've fallen back on using Sire.
+            if prematch != {}:
+                _warnings.warn("RDKit mapping didn't include prematch. Using Sire MCS.")
+
+            # Warn about unsupported options.
+            if not complete_rings_only:
+                _warnings.warn(
+                    "Using Sire MCS. Ignoring unsupported 'complete_rings_only' option!"
+                )
+
+            # Convert timeout to a Sire Unit.
+            timeout = timeout * _SireUnits.second
+
+            # Regular match. Include light atoms, but don't allow matches between heavy
+            # and light atoms.
+            m0 = mol0.evaluate().findMCSmatches(
+                mol1,
+                _SireMol.AtomResultMatcher(_to_sire_mapping(prematch)),
+                timeout,
+                True,
+                property_map0,
+                property_map1,
+                6,
+                False,
+            )
+
+            # Include light atoms, and allow matches between heavy and light atoms.
+            # This captures mappings such as O --> H in methane to methanol.
+            m1 = mol0.evaluate().findMCSmatches(
+                mol1,
+                _SireMol.AtomResultMatcher(_to_sire_mapping(prematch)),
+                timeout,
+                True,
+                property_map0,
+                property_map1,
+                0,
+                False,
+            )
+
+            # Take the mapping with the larger number of matches.
+            if len(m1) > 0:
+                if len(m0) > 0:
+                    if len(m1[0]) > len(m0[0]):
+                        mappings = m1
+                    else:
+                        mappings = m0
+                else:
+                    mappings = m1
+            else:
+                mappings = m0
+
+            # Score the mappings and return them in sorted order (best to worst).
+            mappings, scores = _score_sire_mappings(
+                mol0,
+                mol1,
+                mappings,
+                prematch,
+                _scoring_function,
+                property_map0,
+                property_map1,
+            )
+
+        # Cache the sorted mappings and scores.
+        if cache_file is not None:
+            _write_mapping_cache(cache_file, mappings, scores)
+
     if matches == 1:
         if return_scores:
             return (mappings[0], scores[0])
@@ -2123,3 +2161,138 @@ def _from_sire_mapping(sire_mapping):
             mapping[idx0.value()] = idx1.value()
 
     return mapping
+
+
+def _get_mapping_cache_file(
+    rdkit_molecules,
+    scoring_function,
+    prematch,
+    timeout,
+    complete_rings_only,
+    max_scoring_matches,
+):
+    """
+    Internal function to get the path to the on-disk cache file for the
+    mappings between a pair of molecules. Caching is only enabled when the
+    'BSS_CACHE_ALIGN' environment variable is set to '1'.
+
+    Parameters
+    ----------
+
+    rdkit_molecules : [RDKit.Chem.Mol]
+        The two molecules (RDKit representation).
+
+    scoring_function : str
+        The (normalised) name of the scoring function.
+
+    prematch : dict
+        The atom mappings that must be included in the match.
+
+    timeout : int
+        The timeout for the maximum common substructure search in seconds.
+
+    complete_rings_only : bool
+        Whether to only match complete rings during the MCS search.
+
+    max_scoring_matches : int
+        The maximum number of matching MCS substructures to score.
+
+    Returns
+    -------
+
+    cache_file : str
+        The path to the cache file. None if caching is disabled.
+    """
+
+    if _os.environ.get("BSS_CACHE_ALIGN") != "1":
+        return None
+
+    # Hash the molecules and the matching options. The molecules are hashed
+    # using their MOL blocks, rather than canonical SMILES, since the mapping
+    # depends on the atom ordering, and the scores on the coordinates.
+    hash = _hashlib.blake2b(digest_size=16)
+    hash.update(("%d:%s:" % (_mapping_cache_version, _rdkit.__version__)).encode())
+    for mol in rdkit_molecules:
+        hash.update(_Chem.MolToMolBlock(mol, kekulize=False).encode())
+    hash.update(
+        repr(
+            (
+                scoring_function,
+                sorted(_from_sire_mapping(prematch).items()),
+                timeout,
+                complete_rings_only,
+                max_scoring_matches,
+            )
+        ).encode()
+    )
+
+    return _os.path.join(_mapping_cache_dir, hash.hexdigest() + ".json")
+
+
+def _read_mapping_cache(cache_file):
+    """
+    Internal function to read mappings and scores from an on-disk cache file.
+
+    Parameters
+    ----------
+
+    cache_file : str
+        The path to the cache file.
+
+    Returns
+    -------
+
+    mappings : [dict]
+        The sorted mappings.
+
+    scores : [:class:`Length <BioSimSpace.Types.Length>`]
+        The score for each mapping.
+    """
+
+    with open(cache_file, "r") as file:
+        data = _json.load(file)
+
+    mappings = [{idx0: idx1 for idx0, idx1 in mapping} for mapping in data["mappings"]]
+    scores = [score * _Units.Length.angstrom for score in data["scores"]]
+
+    # Make sure the cache file contains a score for each mapping.
+    if len(mappings) == 0 or len(mappings) != len(scores):
+        raise ValueError("Invalid mapping cache file: '%s'" % cache_file)
+
+    return (mappings, scores)
+
+
+def _write_mapping_cache(cache_file, mappings, scores):
+    """
+    Internal function to write mappings and scores to an on-disk cache file.
+
+    Parameters
+    ----------
+
+    cache_file : str
+        The path to the cache file.
+
+    mappings : [dict]
+        The sorted mappings.
+
+    scores : [:class:`Length <BioSimSpace.Types.Length>`]
+        The score for each mapping.
+    """
+
+    # Store the items of each mapping as a list of pairs, since JSON only
+    # supports string keys. The original order of the mapping is preserved.
+    data = {
+        "mappings": [list(_from_sire_mapping(mapping).items()) for mapping in mappings],
+        "scores": [score.angstroms().value() for score in scores],
+    }
+
+    # Write to a temporary file, then move into place, so that concurrent
+    # readers never see a partially written file.
+    try:
+        _os.makedirs(_mapping_cache_dir, exist_ok=True)
+        tmp_file = "%s.%d.tmp" % (cache_file, _os.getpid())
+        with open(tmp_file, "w") as file:
+            _json.dump(data, file)
+        _os.replace(tmp_file, cache_file)
+    except OSError:
+        _warnings.warn("Unable to write atom mapping cache file: %r" % cache_file)
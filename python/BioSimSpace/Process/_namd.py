@@ -29,6 +29,7 @@ __all__ = ["Namd"]
 from .._Utils import _try_import
 
 import math as _math
+import mmap as _mmap
 import os as _os
 
 _pygtail = _try_import("pygtail")
@@ -39,10 +40,13 @@ from sire.legacy import Base as _SireBase
 from sire.legacy import IO as _SireIO
 from sire.legacy import Mol as _SireMol
 from sire.legacy.Maths import Vector as _Vector
+from sire.mol import Select as _Select
 
 from .. import _isVerbose
 from .._Exceptions import IncompatibleError as _IncompatibleError
 from .._Exceptions import MissingSoftwareError as _MissingSoftwareError
+from ..IO._file_cache import check_cache as _check_cache
+from ..IO._file_cache import update_cache as _update_cache
 from ..Protocol._position_restraint_mixin import _PositionRestraintMixin
 from .._SireWrappers import System as _System
 from ..Types._type import Type as _Type
@@ -136,18 +140,21 @@ class Namd(_process.Process):
         self._stdout_dict = _process._MultiDict()
         self._stdout_title = None
 
+        # The common path prefix for all process files.
+        prefix = _os.path.join(str(self._work_dir), name)
+
         # The names of the input files.
-        self._psf_file = "%s/%s.psf" % (self._work_dir, name)
-        self._top_file = "%s/%s.pdb" % (self._work_dir, name)
-        self._param_file = "%s/%s.params" % (self._work_dir, name)
+        self._psf_file = prefix + ".psf"
+        self._top_file = prefix + ".pdb"
+        self._param_file = prefix + ".params"
         self._velocity_file = None
         self._restraint_file = None
 
         # The name of the trajectory file.
-        self._traj_file = "%s/%s_out.dcd" % (self._work_dir, name)
+        self._traj_file = prefix + "_out.dcd"
 
         # Set the path for the NAMD configuration file.
-        self._config_file = "%s/%s.cfg" % (self._work_dir, name)
+        self._config_file = prefix + ".cfg"
 
         # Create the list of input files.
         self._input_files = [
@@ -160,6 +167,21 @@ class Namd(_process.Process):
         # Now set up the working directory for the process.
         self._setup()
 
+    @property
+    def _system(self):
+        """The molecular system for the process."""
+        return self.__system
+
+    @_system.setter
+    def _system(self, system):
+        """
+        Set the molecular system, clearing any cached box information. The
+        cache assumes that the system is only ever replaced, never modified
+        in place.
+        """
+        self.__system = system
+        self._box_info = None
+
     def _setup(self):
         """Setup the input files and working directory ready for simulation."""
 
@@ -171,18 +193,94 @@ class Namd(_process.Process):
         # Check for perturbable molecules and convert to the chosen end state.
         system = self._checkPerturbable(system)
 
-        # PSF and parameter files.
-        try:
-            file = _os.path.splitext(self._psf_file)[0]
-            _IO.saveMolecules(file, system, "psf", property_map=self._property_map)
-        except Exception as e:
-            msg = "Failed to write system to 'CHARMMPSF' format."
-            if _isVerbose():
-                raise IOError(msg) from e
-            else:
-                raise IOError(msg) from None
+        # Try to write a PDB "velocity" restart file.
+        # The file will only be generated if all atoms in the system have
+        # a "velocity" property.
+        if self._has_velocities(system):
+            velocity_file = _os.path.splitext(self._top_file)[0] + ".vel"
+        else:
+            velocity_file = None
+
+        # Write the input files.
+        has_velocities = self._write_input_files(system, velocity_file)
+
+        # If a velocity file was written, store the name of the file and update
+        # the list of input files.
+        if has_velocities:
+            self._velocity_file = velocity_file
+            self._input_files.append(self._velocity_file)
+
+        # Generate the NAMD configuration file.
+        if isinstance(self._protocol, _Protocol.Custom):
+            self.setConfig(self._protocol.getConfig())
+        else:
+            self._generate_config()
+        self.writeConfig(self._config_file)
+
+        # Return the list of input files.
+        return self._input_files
+
+    def _write_input_files(self, system, velocity_file=None):
+        """
+        Internal helper function to write the PSF, parameter, PDB, and
+        velocity input files.
+
+        Parameters
+        ----------
+
+        system : :class:`System <BioSimSpace._SireWrappers.System>`
+            The molecular system.
+
+        velocity_file : str
+            The path to the velocity file. If None, then no velocity file
+            is written.
+
+        Returns
+        -------
+
+        has_velocities : bool
+            Whether a velocity file was written.
+        """
+
+        # PSF and parameter files. The PSF file is patched with any records
+        # that NAMD requires, so the patched files are stored in the file
+        # cache under NAMD specific formats. This means that they can be
+        # re-used if the same system is set up again.
+        filebase = _os.path.splitext(self._psf_file)[0]
+        if not (
+            _check_cache(system, "NAMDPSF", filebase, property_map=self._property_map)
+            and _check_cache(
+                system, "NAMDPARAMS", filebase, property_map=self._property_map
+            )
+        ):
+            try:
+                _IO.saveMolecules(
+                    filebase, system, "psf", property_map=self._property_map
+                )
+            except Exception as e:
+                msg = "Failed to write system to 'CHARMMPSF' format."
+                if _isVerbose():
+                    raise IOError(msg) from e
+                else:
+                    raise IOError(msg) from None
+
+            # Add any missing records to the PSF file.
+            self._add_psf_records()
 
-        # PDB file.
+            # Add the new files to the cache.
+            _update_cache(system, "NAMDPSF", self._psf_file)
+            _update_cache(system, "NAMDPARAMS", self._param_file)
+
+        # PDB file. If no velocity file is needed, then try to re-use a
+        # previously written file from the BioSimSpace.IO file cache.
+        filebase = _os.path.splitext(self._top_file)[0]
+        if velocity_file is None and _check_cache(
+            system, "PDB", filebase, property_map=self._property_map
+        ):
+            return False
+
+        # Otherwise, parse the system to PDB format once and use this to write
+        # both the PDB file and the velocity file.
         try:
             pdb = _SireIO.PDB2(system._sire_object, self._property_map)
             pdb.writeToFile(self._top_file)
@@ -193,144 +291,105 @@ class Namd(_process.Process):
             else:
                 raise IOError(msg) from None
 
-        # Try to write a PDB "velocity" restart file.
-        # The file will only be generated if all atoms in the system have
-        # a "velocity" property.
-
-        # First generate a name for the velocity file.
-        velocity_file = _os.path.splitext(self._top_file)[0] + ".vel"
+        # Add the new file to the cache.
+        _update_cache(system, "PDB", self._top_file)
 
         # Write the velocity file.
-        has_velocities = pdb.writeVelocityFile(velocity_file)
+        if velocity_file is None:
+            return False
+        return pdb.writeVelocityFile(velocity_file)
 
-        # If a file was written, store the name of the file and update the
-        # list of input files.
-        if has_velocities:
-            self._velocity_file = velocity_file
-            self._input_files.append(self._velocity_file)
+    def _add_psf_records(self):
+        """
+        Internal helper function to add any records that NAMD requires to
+        the PSF file.
+        """
 
         # NAMD requires donor, acceptor, and non-bonded exclusion record entries
         # in the PSF file. We check that these are present and append blank
         # records if not. The records are actually redundant (they have no
         # affect on the MD) so could be stripped (or zeroed) by the CharmmPSF
-        # parser.
-        has_donors = False
-        has_acceptors = False
-        has_non_bonded = False
-
-        # When converting forcefields, improper terms may be represented as
-        # dihedrals (cosine impropers). As such, there will be no improper
-        # records in the PSF file.
-        has_impropers = False
-
-        # Open the PSF file for reading.
-        with open(self._psf_file) as file:
-            # Loop over all lines.
-            for line in file:
-                # There are improper records.
-                if "!NIMPHI" in line:
-                    has_impropers = True
-
-                # There are donor records.
-                elif "!NDON" in line:
-                    has_donors = True
-
-                # There are acceptor records.
-                elif "NACC" in line:
-                    has_acceptors = True
-
-                # There are non-bonded exclusion records.
-                elif "NNB" in line:
-                    has_non_bonded = True
-
-        # Append empty improper record.
+        # parser. When converting forcefields, improper terms may be
+        # represented as dihedrals (cosine impropers). As such, there may
+        # also be no improper records in the PSF file.
+
+        # Memory-map the PSF file and search the raw bytes for each record
+        # header, rather than looping over the file line by line.
+        with open(self._psf_file, "rb") as file:
+            with _mmap.mmap(file.fileno(), 0, access=_mmap.ACCESS_READ) as mm:
+                has_impropers = mm.find(b"!NIMPHI") != -1
+                has_donors = mm.find(b"!NDON") != -1
+                has_acceptors = mm.find(b"!NACC") != -1
+                has_non_bonded = mm.find(b"!NNB") != -1
+
+        # Append any missing records in a single write.
+        records = []
+
+        # Empty improper record.
         if not has_impropers:
-            file = open(self._psf_file, "a")
-            file.write("\n%8d !NIMPHI: impropers\n" % 0)
-            file.close()
+            records.append("\n%8d !NIMPHI: impropers\n" % 0)
 
-        # Append empty donor record.
+        # Empty donor record.
         if not has_donors:
-            file = open(self._psf_file, "a")
-            file.write("\n%8d !NDON: donors\n" % 0)
-            file.close()
+            records.append("\n%8d !NDON: donors\n" % 0)
 
-        # Append empty acceptor record.
+        # Empty acceptor record.
         if not has_acceptors:
-            file = open(self._psf_file, "a")
-            file.write("\n%8d !NACC: acceptors\n" % 0)
-            file.close()
+            records.append("\n%8d !NACC: acceptors\n" % 0)
 
-        # Append empty non-bonded exclusion record.
+        # Empty non-bonded exclusion record.
         if not has_non_bonded:
-            file = open(self._psf_file, "a")
-            file.write("\n%8d !NNB: excluded\n" % 0)
-            file.close()
+            records.append("\n%8d !NNB: excluded\n" % 0)
 
-        # Generate the NAMD configuration file.
-        if isinstance(self._protocol, _Protocol.Custom):
-            self.setConfig(self._protocol.getConfig())
-        else:
-            self._generate_config()
-        self.writeConfig(self._config_file)
-
-        # Return the list of input files.
-        return self._input_files
+        if records:
+            with open(self._psf_file, "a") as file:
+                file.write("".join(records))
 
-    def _generate_config(self):
-        """Generate NAMD configuration file strings."""
+    def _has_velocities(self, system):
+        """
+        Internal helper function to check whether all molecules in the
+        system have velocities. This queries the Sire system directly, to
+        avoid creating a wrapper for every molecule.
 
-        # Clear the existing configuration list.
-        self._config = []
+        Parameters
+        ----------
 
-        # Flag that the system doesn't contain a box.
-        has_box = False
+        system : :class:`System <BioSimSpace._SireWrappers.System>`
+            The molecular system.
 
-        prop = self._property_map.get("space", "space")
+        Returns
+        -------
 
-        if prop in self._system._sire_object.propertyKeys():
-            try:
-                box = self._system._sire_object.property(prop)
+        has_velocities : bool
+            Whether all molecules have velocities.
+        """
 
-                # Flag that we have found a periodic box.
-                has_box = box.isPeriodic()
-            except Exception:
-                box = None
+        prop = self._property_map.get("velocity", "velocity")
 
-        # Check whether the system contains periodic box information.
-        if has_box:
-            # Periodic box.
-            try:
-                box_size = self._system._sire_object.property(prop).dimensions()
-                v0 = _Vector(box_size.x().value(), 0, 0)
-                v1 = _Vector(0, box_size.y().value(), 0)
-                v2 = _Vector(0, 0, box_size.z().value())
+        try:
+            num_vels = len(
+                _Select("mols with property %s" % prop)(
+                    system._sire_object, self._property_map
+                )
+            )
+        except:
+            num_vels = 0
 
-            # TriclinicBox.
-            except:
-                box = self._system._sire_object.property(prop)
-                v0 = box.vector0()
-                v1 = box.vector1()
-                v2 = box.vector2()
+        return num_vels > 0 and num_vels == system.nMolecules()
 
-            # Work out the minimum box size.
-            box_size = min(v0.magnitude(), v1.magnitude(), v2.magnitude())
+    def _generate_config(self):
+        """Generate NAMD configuration file strings."""
 
-            # Convert vectors to tuples.
-            v0 = tuple(x.value() for x in v0)
-            v1 = tuple(x.value() for x in v1)
-            v2 = tuple(x.value() for x in v2)
+        # Build the configuration in a local list and store it in one go,
+        # rather than re-writing the file for every addToConfig call.
+        config = []
 
-            # Since the box is translationally invariant, we set the cell
-            # origin to be the average of the atomic coordinates. This
-            # ensures a consistent wrapping for coordinates in the NAMD
-            # output files.
-            origin = tuple(x.value() for x in self._system._getAABox().center())
+        # Get the (cached) periodic box information.
+        has_box, box_size, v0, v1, v2, origin = self._get_box_info()
 
         # No box information. Assume this is a gas phase simulation.
-        else:
+        if not has_box:
             _warnings.warn("No simulation box found. Assuming gas phase simulation.")
-            has_box = False
 
         prop = self._property_map.get("param_format", "param_format")
 
@@ -352,69 +411,71 @@ class Namd(_process.Process):
         # Append generic configuration variables.
 
         # Topology.
-        self.addToConfig("structure             %s" % _os.path.basename(self._psf_file))
-        self.addToConfig("coordinates           %s" % _os.path.basename(self._top_file))
+        config.append("structure             %s" % _os.path.basename(self._psf_file))
+        config.append("coordinates           %s" % _os.path.basename(self._top_file))
 
         # Velocities.
         if self._velocity_file is not None:
-            self.addToConfig(
+            config.append(
                 "velocities            %s" % _os.path.basename(self._velocity_file)
             )
 
         # Parameters.
         if is_charmm:
-            self.addToConfig("paraTypeCharmm        on")
-        self.addToConfig(
-            "parameters            %s" % _os.path.basename(self._param_file)
-        )
+            config.append("paraTypeCharmm        on")
+        config.append("parameters            %s" % _os.path.basename(self._param_file))
 
         # Random number seed.
         if self._is_seeded:
-            self.addToConfig("seed                  %d" % self._seed)
+            config.append("seed                  %d" % self._seed)
 
         # Exclusion policy.
-        self.addToConfig("exclude               scaled1-4")
+        config.append("exclude               scaled1-4")
 
         # Non-bonded potential parameters.
 
         # Gas phase.
         if not has_box or not self._has_water:
-            self.addToConfig("cutoff                999.")
-            self.addToConfig("zeroMomentum          yes")
-            self.addToConfig("switching             off")
+            config.append("cutoff                999.")
+            config.append("zeroMomentum          yes")
+            config.append("switching             off")
 
         # Solvated.
         else:
             # Only use a cutoff if the box is large enough.
             if box_size > 26:
-                self.addToConfig("cutoff                12.")
-                self.addToConfig("pairlistdist          14.")
-                self.addToConfig("switching             on")
-                self.addToConfig("switchdist            10.")
+                config.append("cutoff                12.")
+                config.append("pairlistdist          14.")
+                config.append("switching             on")
+                config.append("switchdist            10.")
 
             # Load the XSC file.
-            self.addToConfig("extendedSystem        %s.xsc" % self._name)
+            config.append("extendedSystem        %s.xsc" % self._name)
             # We force the cell origin to be located at the system's centre
             # of geometry. This ensures a consistent periodic wrapping for
             # all NAMD output.
-            self.addToConfig("cellOrigin            %.3f   %.3f   %.3f" % origin)
+            config.append("cellOrigin            %.3f   %.3f   %.3f" % origin)
 
             # Add the cell vectors.
-            self.addToConfig("cellBasisVector1      %.3f   %.3f   %.3f" % v0)
-            self.addToConfig("cellBasisVector2      %.3f   %.3f   %.3f" % v1)
-            self.addToConfig("cellBasisVector3      %.3f   %.3f   %.3f" % v2)
+            config.append("cellBasisVector1      %.3f   %.3f   %.3f" % v0)
+            config.append("cellBasisVector2      %.3f   %.3f   %.3f" % v1)
+            config.append("cellBasisVector3      %.3f   %.3f   %.3f" % v2)
 
             # Wrap all molecular coordinates to the periodic box.
-            self.addToConfig("wrapAll               on")
+            config.append("wrapAll               on")
 
             # Periodic electrostatics.
-            self.addToConfig("PME                   yes")
-            self.addToConfig("PMEGridSpacing        1.")
-
-        # Output file parameters.
-        self.addToConfig("outputName            %s_out" % self._name)
-        self.addToConfig("binaryOutput          no")
-        self.addToConfig("binaryRestart         no")
+            config.append("PME                   yes")
+            config.append("PMEGridSpacing        1.")
+
+        # Output file parameters. Trajectory frames are written to a binary
+        # DCD file. Final and restart coordinates must stay in ASCII (PDB)
+        # format, since these are parsed by Sire when reading the system
+        # back in getSystem, and Sire has no reader for NAMD binary files.
+        config.append("outputName            %s_out" % self._name)
+        config.append("DCDfile               %s" % _os.path.basename(self._traj_file))
+        config.append("binaryOutput          no")
+        config.append("binaryRestart         no")
 
         # Position restraints.
         if isinstance(self._protocol, _PositionRestraintMixin):
@@ -430,9 +491,8 @@ class Namd(_process.Process):
                     p = _SireIO.PDB2(restrained._sire_object, {prop: "restrained"})
 
                     # File name for the restraint file.
-                    self._restraint_file = "%s/%s.restrained" % (
-                        self._work_dir,
-                        self._name,
+                    self._restraint_file = (
+                        _os.path.join(str(self._work_dir), self._name) + ".restrained"
                     )
 
                     # Write the PDB file.
@@ -445,38 +505,43 @@ class Namd(_process.Process):
                     )
 
                 # Update the configuration file.
-                self.addToConfig("constraints           yes")
-                self.addToConfig("consref               %s.restrained" % self._name)
-                self.addToConfig("conskfile             %s.restrained" % self._name)
-                self.addToConfig("conskcol              O")
+                config.append("constraints           yes")
+                config.append("consref               %s.restrained" % self._name)
+                config.append("conskfile             %s.restrained" % self._name)
+                config.append("conskcol              O")
 
         # Add configuration variables for a minimisation simulation.
         if isinstance(self._protocol, _Protocol.Minimisation):
             # Output frequency.
-            self.addToConfig("restartfreq           500")
-            self.addToConfig("xstFreq               500")
+            config.append("restartfreq           500")
+            config.append("xstFreq               500")
 
             # Printing frequency.
-            self.addToConfig("outputEnergies        100")
-            self.addToConfig("outputTiming          1000")
+            config.append("outputEnergies        100")
+            config.append("outputTiming          1000")
 
-            self.addToConfig("temperature           300")
+            config.append("temperature           300")
 
             # Work out the number of steps. This must be a multiple of
             # stepspercycle, which is set the default of 20.
             steps = 20 * _math.ceil(self._protocol.getSteps() / 20)
-            self.addToConfig("minimize              %d" % steps)
+            config.append("minimize              %d" % steps)
 
         # Add configuration variables for an equilibration simulation.
         elif isinstance(self._protocol, _Protocol.Equilibration):
+            # Store the protocol and the temperature parameters locally, since
+            # these are used repeatedly below.
+            protocol = self._protocol
+            is_constant_temp = protocol.isConstantTemp()
+            temp_start = protocol.getStartTemperature().kelvin().value()
+            temp_end = protocol.getEndTemperature().kelvin().value()
+
             # Work out the number of integration steps.
-            steps = _math.ceil(
-                self._protocol.getRunTime() / self._protocol.getTimeStep()
-            )
+            steps = _math.ceil(protocol.getRunTime() / protocol.getTimeStep())
 
             # Get the report and restart intervals.
-            report_interval = self._protocol.getReportInterval()
-            restart_interval = self._protocol.getRestartInterval()
+            report_interval = protocol.getReportInterval()
+            restart_interval = protocol.getRestartInterval()
 
             # Cap the intervals at the total number of steps.
             if report_interval > steps:
@@ -485,80 +550,64 @@ class Namd(_process.Process):
                 restart_interval = steps
 
             # Output frequency.
-            self.addToConfig("restartfreq           %d" % restart_interval)
-            self.addToConfig("xstFreq               %d" % restart_interval)
+            config.append("restartfreq           %d" % restart_interval)
+            config.append("xstFreq               %d" % restart_interval)
 
             # Printing frequency.
-            self.addToConfig("outputEnergies        %d" % report_interval)
-            self.addToConfig("outputTiming          1000")
+            config.append("outputEnergies        %d" % report_interval)
+            config.append("outputTiming          1000")
 
             # Set the Tcl temperature variable.
-            if self._protocol.isConstantTemp():
-                self.addToConfig(
-                    "set temperature       %.2f"
-                    % self._protocol.getStartTemperature().kelvin().value()
-                )
+            if is_constant_temp:
+                config.append("set temperature       %.2f" % temp_start)
             else:
-                self.addToConfig(
-                    "set temperature       %.2f"
-                    % self._protocol.getEndTemperature().kelvin().value()
-                )
-            self.addToConfig("temperature           $temperature")
+                config.append("set temperature       %.2f" % temp_end)
+            config.append("temperature           $temperature")
 
             # Integrator parameters.
-            self.addToConfig(
+            config.append(
                 "timestep              %.2f"
-                % self._protocol.getTimeStep().femtoseconds().value()
+                % protocol.getTimeStep().femtoseconds().value()
             )
-            self.addToConfig("rigidBonds            all")
-            self.addToConfig("nonbondedFreq         1")
-            self.addToConfig("fullElectFrequency    2")
+            config.append("rigidBonds            all")
+            config.append("nonbondedFreq         1")
+            config.append("fullElectFrequency    2")
 
             # Constant temperature control.
-            self.addToConfig("langevin              on")
-            self.addToConfig("langevinDamping       1.")
-            self.addToConfig("langevinTemp          $temperature")
-            self.addToConfig("langevinHydrogen      no")
+            config.append("langevin              on")
+            config.append("langevinDamping       1.")
+            config.append("langevinTemp          $temperature")
+            config.append("langevinHydrogen      no")
 
             # Constant pressure control.
-            if self._protocol.getPressure() is not None:
-                self.addToConfig("langevinPiston        on")
-                self.addToConfig(
-                    "langevinPistonTarget  %.5f"
-                    % self._protocol.getPressure().bar().value()
+            if protocol.getPressure() is not None:
+                config.append("langevinPiston        on")
+                config.append(
+                    "langevinPistonTarget  %.5f" % protocol.getPressure().bar().value()
                 )
-                self.addToConfig("langevinPistonPeriod  100.")
-                self.addToConfig("langevinPistonDecay   50.")
-                self.addToConfig("langevinPistonTemp    $temperature")
-                self.addToConfig("useGroupPressure      yes")
-                self.addToConfig("useFlexibleCell       no")
-                self.addToConfig("useConstantArea       no")
+                config.append("langevinPistonPeriod  100.")
+                config.append("langevinPistonDecay   50.")
+                config.append("langevinPistonTemp    $temperature")
+                config.append("useGroupPressure      yes")
+                config.append("useFlexibleCell       no")
+                config.append("useConstantArea       no")
 
             # Heating/cooling simulation.
-            if not self._protocol.isConstantTemp():
+            if not is_constant_temp:
                 # Work out temperature step size (assuming a unit increment).
-                denom = abs(
-                    self._protocol.getEndTemperature().kelvin().value()
-                    - self._protocol.getStartTemperature().kelvin().value()
-                )
+                denom = abs(temp_end - temp_start)
                 freq = _math.floor(steps / denom)
 
-                self.addToConfig("reassignFreq          %d" % freq)
-                self.addToConfig(
-                    "reassignTemp          %.2f"
-                    % self._protocol.getStartTemperature().kelvin().value()
-                )
-                self.addToConfig("reassignIncr          1.")
-                self.addToConfig(
-                    "reassignHold          %.2f"
-                    % self._protocol.getEndTemperature().kelvin().value()
-                )
+                config.append("reassignFreq          %d" % freq)
+                config.append("reassignTemp          %.2f" % temp_start)
+                config.append("reassignIncr          1.")
+                config.append("reassignHold          %.2f" % temp_end)
 
             # Trajectory output frequency.
-            self.addToConfig("DCDfreq               %d" % restart_interval)
+            config.append("DCDfreq               %d" % restart_interval)
 
             # Run the simulation.
-            self.addToConfig("run                   %d" % steps)
+            config.append("run                   %d" % steps)
 
         # Add configuration variables for a production simulation.
         elif isinstance(self._protocol, _Protocol.Production):
@@ -578,68 +627,134 @@ class Namd(_process.Process):
                 restart_interval = steps
 
             # Output frequency.
-            self.addToConfig("restartfreq           %d" % restart_interval)
-            self.addToConfig("xstFreq               %d" % restart_interval)
+            config.append("restartfreq           %d" % restart_interval)
+            config.append("xstFreq               %d" % restart_interval)
 
             # Printing frequency.
-            self.addToConfig("outputEnergies        %d" % report_interval)
-            self.addToConfig("outputTiming          1000")
+            config.append("outputEnergies        %d" % report_interval)
+            config.append("outputTiming          1000")
 
             # Set the Tcl temperature variable.
-            self.addToConfig(
+            config.append(
                 "set temperature       %.2f"
                 % self._protocol.getTemperature().kelvin().value()
             )
-            self.addToConfig("temperature           $temperature")
+            config.append("temperature           $temperature")
 
             # Integrator parameters.
-            self.addToConfig(
+            config.append(
                 "timestep              %.2f"
                 % self._protocol.getTimeStep().femtoseconds().value()
             )
-            self.addToConfig("rigidBonds            all")
-            self.addToConfig("nonbondedFreq         1")
-            self.addToConfig("fullElectFrequency    2")
+            config.append("rigidBonds            all")
+            config.append("nonbondedFreq         1")
+            config.append("fullElectFrequency    2")
 
             # Constant temperature control.
-            self.addToConfig("langevin              on")
-            self.addToConfig("langevinDamping       1.")
-            self.addToConfig("langevinTemp          $temperature")
-            self.addToConfig("langevinHydrogen      no")
+            config.append("langevin              on")
+            config.append("langevinDamping       1.")
+            config.append("langevinTemp          $temperature")
+            config.append("langevinHydrogen      no")
 
             # Constant pressure control.
             if self._protocol.getPressure() is not None:
-                self.addToConfig("langevinPiston        on")
-                self.addToConfig(
+                config.append("langevinPiston        on")
+                config.append(
                     "langevinPistonTarget  %.5f"
                     % self._protocol.getPressure().bar().value()
                 )
-                self.addToConfig("langevinPistonPeriod  100.")
-                self.addToConfig("langevinPistonDecay   50.")
-                self.addToConfig("langevinPistonTemp    $temperature")
-                self.addToConfig("useGroupPressure      yes")
-                self.addToConfig("useFlexibleCell       no")
-                self.addToConfig("useConstantArea       no")
-
-            # Work out number of steps needed to exceed desired running time.
-            steps = _math.ceil(
-                self._protocol.getRunTime() / self._protocol.getTimeStep()
-            )
+                config.append("langevinPistonPeriod  100.")
+                config.append("langevinPistonDecay   50.")
+                config.append("langevinPistonTemp    $temperature")
+                config.append("useGroupPressure      yes")
+                config.append("useFlexibleCell       no")
+                config.append("useConstantArea       no")
 
             # Trajectory output frequency.
-            self.addToConfig("DCDfreq               %d" % restart_interval)
+            config.append("DCDfreq               %d" % restart_interval)
 
             # Run the simulation.
-            self.addToConfig("run                   %d" % steps)
+            config.append("run                   %d" % steps)
 
         else:
             raise _IncompatibleError(
                 "Unsupported protocol: '%s'" % self._protocol.__class__.__name__
             )
 
+        # Store the configuration.
+        self._config = config
+
         # Flag that this isn't a custom protocol.
         self._protocol._setCustomised(False)
 
+    def _get_box_info(self):
+        """
+        Internal helper function to get the periodic box information for
+        the system. The result is cached, since working out the cell origin
+        requires a pass over the coordinates of every atom.
+
+        Returns
+        -------
+
+        box_info : (bool, float, (float,), (float,), (float,), (float,))
+            Whether the system has a periodic box, the minimum box size,
+            the three box vectors, and the cell origin.
+        """
+
+        if self._box_info is not None:
+            return self._box_info
+
+        # Flag that the system doesn't contain a box.
+        has_box = False
+        box_size = None
+        v0 = v1 = v2 = None
+        origin = None
+
+        prop = self._property_map.get("space", "space")
+
+        if prop in self._system._sire_object.propertyKeys():
+            try:
+                box = self._system._sire_object.property(prop)
+
+                # Flag that we have found a periodic box.
+                has_box = box.isPeriodic()
+            except Exception:
+                box = None
+
+        # Check whether the system contains periodic box information.
+        if has_box:
+            # Periodic box.
+            try:
+                box_size = self._system._sire_object.property(prop).dimensions()
+                v0 = _Vector(box_size.x().value(), 0, 0)
+                v1 = _Vector(0, box_size.y().value(), 0)
+                v2 = _Vector(0, 0, box_size.z().value())
+
+            # TriclinicBox.
+            except:
+                box = self._system._sire_object.property(prop)
+                v0 = box.vector0()
+                v1 = box.vector1()
+                v2 = box.vector2()
+
+            # Work out the minimum box size.
+            box_size = min(v0.magnitude(), v1.magnitude(), v2.magnitude())
+
+            # Convert vectors to tuples.
+            v0 = tuple(x.value() for x in v0)
+            v1 = tuple(x.value() for x in v1)
+            v2 = tuple(x.value() for x in v2)
+
+            # Since the box is translationally invariant, we set the cell
+            # origin to be the average of the atomic coordinates. This
+            # ensures a consistent wrapping for coordinates in the NAMD
+            # output files.
+            origin = tuple(x.value() for x in self._system._getAABox().center())
+
+        self._box_info = (has_box, box_size, v0, v1, v2, origin)
+
+        return self._box_info
+
     def start(self):
         """
         Start the NAMD process.
@@ -663,21 +778,22 @@ class Namd(_process.Process):
         # Clear any existing output.
         self._clear_output()
 
-        # Run the process in the working directory.
-        with _Utils.cd(self._work_dir):
-            # Write the command-line process to a README.txt file.
-            with open("README.txt", "w") as file:
-                # Set the command-line string.
-                self._command = "%s %s.cfg" % (self._exe, self._name)
+        # Set the command-line string.
+        self._command = "%s %s.cfg" % (self._exe, self._name)
 
-                # Write the command to file.
-                file.write("# NAMD was run with the following command:\n")
-                file.write("%s\n" % self._command)
+        # Write the command-line process to a README.txt file. This uses an
+        # absolute path, so doesn't require a change of directory.
+        with open(_os.path.join(str(self._work_dir), "README.txt"), "w") as file:
+            file.write("# NAMD was run with the following command:\n")
+            file.write("%s\n" % self._command)
 
-            # Start the timer.
-            self._timer = _timeit.default_timer()
+        # Start the timer.
+        self._timer = _timeit.default_timer()
 
-            # Start the simulation.
+        # Start the simulation. Sire's Process.run has no option to set the
+        # working directory of the child process, so the directory change is
+        # kept to the launch itself.
+        with _Utils.cd(self._work_dir):
             self._process = _SireBase.Process.run(
                 self._exe,
                 "%s.cfg" % self._name,
@@ -717,16 +833,19 @@ class Namd(_process.Process):
         # Read the PDB coordinate file and construct a parameterised molecular
         # system using the original PSF and param files.
 
+        # The common path prefix for the output files.
+        prefix = _os.path.join(str(self._work_dir), self._name)
+
         has_coor = False
 
         # First check for final configuration.
-        if _os.path.isfile("%s/%s_out.coor" % (self._work_dir, self._name)):
-            coor_file = "%s/%s_out.coor" % (self._work_dir, self._name)
+        if _os.path.isfile(prefix + "_out.coor"):
+            coor_file = prefix + "_out.coor"
             has_coor = True
 
         # Otherwise check for a restart file.
-        elif _os.path.isfile("%s/%s_out.restart.coor" % (self._work_dir, self._name)):
-            coor_file = "%s/%s_out.restart.coor" % (self._work_dir, self._name)
+        elif _os.path.isfile(prefix + "_out.restart.coor"):
+            coor_file = prefix + "_out.restart.coor"
             has_coor = True
 
         # Try to find an XSC file.
@@ -734,13 +853,13 @@ class Namd(_process.Process):
         has_xsc = False
 
         # First check for final XSC file.
-        if _os.path.isfile("%s/%s_out.xsc" % (self._work_dir, self._name)):
-            xsc_file = "%s/%s_out.xsc" % (self._work_dir, self._name)
+        if _os.path.isfile(prefix + "_out.xsc"):
+            xsc_file = prefix + "_out.xsc"
             has_xsc = True
 
         # Otherwise check for a restart XSC file.
-        elif _os.path.isfile("%s/%s_out.restart.xsc" % (self._work_dir, self._name)):
-            xsc_file = "%s/%s_out.restart.xsc" % (self._work_dir, self._name)
+        elif _os.path.isfile(prefix + "_out.restart.xsc"):
+            xsc_file = prefix + "_out.restart.xsc"
             has_xsc = True
 
         # We found a coordinate file.
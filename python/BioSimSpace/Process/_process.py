@@ -1341,8 +1341,7 @@ class Process:
             raise TypeError("'file' must be of type 'str'")
 
         with open(file, "w") as f:
-            for line in self._config:
-                f.write("%s\n" % line)
+            f.write("".join("%s\n" % line for line in self._config))
 
     def _writePlumedConfig(self, file):
         """
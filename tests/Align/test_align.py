@@ -1,3 +1,6 @@
+import functools
+
+import numpy as np
 import pytest
 
 from sire.legacy.MM import InternalFF, IntraCLJFF, IntraFF
@@ -5,49 +8,73 @@ from sire.legacy.Mol import AtomIdx, Element, PartialMolecule
 
 import BioSimSpace as BSS
 
-# Store the tutorial URL.
-url = BSS.tutorialUrl()
+from tests.conftest import url, read_molecules
 
 
 @pytest.fixture(scope="session")
 def system0():
-    return BSS.IO.readMolecules(
-        [f"{url}/ligand01.prm7.bz2", f"{url}/ligand01.rst7.bz2"]
-    )
+    return read_molecules([f"{url}/ligand01.prm7.bz2", f"{url}/ligand01.rst7.bz2"])
 
 
 @pytest.fixture(scope="session")
 def system1():
-    return BSS.IO.readMolecules(
-        [f"{url}/ligand02.prm7.bz2", f"{url}/ligand02.rst7.bz2"]
-    )
+    return read_molecules([f"{url}/ligand02.prm7.bz2", f"{url}/ligand02.rst7.bz2"])
+
 
+@pytest.fixture(scope="session")
+def molecule0(system0):
+    return system0.getMolecules()[0]
+
+
+@pytest.fixture(scope="session")
+def molecule1(system1):
+    return system1.getMolecules()[0]
 
-def test_flex_align(system0, system1):
+
+@pytest.fixture(scope="session")
+def ligand_cache():
+    # Return a function that loads a ligand by name, reading each one once.
+    @functools.lru_cache(maxsize=None)
+    def load_ligand(name):
+        return read_molecules(
+            [f"{url}/{name}.prm7.bz2", f"{url}/{name}.rst7.bz2"]
+        ).getMolecules()[0]
+
+    return load_ligand
+
+
+@pytest.fixture(scope="session")
+def ligand31_38(ligand_cache):
+    # Load the ligands.
+    m0 = ligand_cache("ligand31")
+    m1 = ligand_cache("ligand38")
+
+    # Get the best mapping between the molecules.
+    mapping = BSS.Align.matchAtoms(m0, m1, timeout=BSS.Units.Time.second)
+
+    return m0, m1, mapping
+
+
+def test_flex_align(molecule0, molecule1):
     # This tests that the flex align functionality runs. We can't test
     # for consistent output, since we have occasionally observed different
     # mappings across platforms.
 
-    # Extract the molecules.
-    m0 = system0.getMolecules()[0]
-    m1 = system1.getMolecules()[0]
-
     # Get the best mapping between the molecules that contains the prematch.
     mapping = BSS.Align.matchAtoms(
-        m0, m1, timeout=BSS.Units.Time.second, scoring_function="rmsd_flex_align"
+        molecule0,
+        molecule1,
+        timeout=BSS.Units.Time.second,
+        scoring_function="rmsd_flex_align",
     )
 
 
 # Parameterise the function with a set of valid atom pre-matches.
 @pytest.mark.parametrize("prematch", [{3: 1}, {5: 9}, {4: 5}, {1: 0}])
-def test_prematch(system0, system1, prematch):
-    # Extract the molecules.
-    m0 = system0.getMolecules()[0]
-    m1 = system1.getMolecules()[0]
-
+def test_prematch(molecule0, molecule1, prematch):
     # Get the best mapping between the molecules that contains the prematch.
     mapping = BSS.Align.matchAtoms(
-        m0, m1, timeout=BSS.Units.Time.second, prematch=prematch
+        molecule0, molecule1, timeout=BSS.Units.Time.second, prematch=prematch
     )
 
     # Check that the prematch key:value pair is in the mapping.
@@ -57,29 +84,66 @@ def test_prematch(system0, system1, prematch):
 
 # Parameterise the function with a set of invalid atom pre-matches.
 @pytest.mark.parametrize("prematch", [{-1: 1}, {50: 9}, {4: 48}, {1: -1}])
-def test_invalid_prematch(system0, system1, prematch):
-    # Extract the molecules.
-    m0 = system0.getMolecules()[0]
-    m1 = system1.getMolecules()[0]
-
+def test_invalid_prematch(molecule0, molecule1, prematch):
     # Assert that the invalid prematch raises a ValueError.
     with pytest.raises(ValueError):
         mapping = BSS.Align.matchAtoms(
-            m0, m1, timeout=BSS.Units.Time.second, prematch=prematch
+            molecule0, molecule1, timeout=BSS.Units.Time.second, prematch=prematch
         )
 
 
-def test_merge():
-    # Load the ligands.
-    s0 = BSS.IO.readMolecules([f"{url}/ligand31.prm7.bz2", f"{url}/ligand31.rst7.bz2"])
-    s1 = BSS.IO.readMolecules([f"{url}/ligand38.prm7.bz2", f"{url}/ligand38.rst7.bz2"])
+def test_mapping_cache(molecule0, molecule1, monkeypatch, tmp_path):
+    # Enable the on-disk mapping cache, using a temporary directory.
+    monkeypatch.setenv("BSS_CACHE_ALIGN", "1")
+    monkeypatch.setattr(BSS.Align._align, "_mapping_cache_dir", str(tmp_path))
 
-    # Extract the molecules.
-    m0 = s0.getMolecules()[0]
-    m1 = s1.getMolecules()[0]
+    # Generate the mapping, which will be written to the cache.
+    mapping0, scores0 = BSS.Align.matchAtoms(
+        molecule0, molecule1, timeout=BSS.Units.Time.second, return_scores=True
+    )
 
-    # Get the best mapping between the molecules.
-    mapping = BSS.Align.matchAtoms(m0, m1, timeout=BSS.Units.Time.second)
+    # Make sure a cache file was written.
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+    # Make sure that the MCS search can't be run again, so that the second
+    # call must be a cache hit.
+    def find_mcs(*args, **kwargs):
+        raise AssertionError("The mapping wasn't read from the cache.")
+
+    monkeypatch.setattr(BSS.Align._align._rdFMCS, "FindMCS", find_mcs)
+
+    # Generate the mapping again. This should be read from the cache.
+    mapping1, scores1 = BSS.Align.matchAtoms(
+        molecule0, molecule1, timeout=BSS.Units.Time.second, return_scores=True
+    )
+
+    # Make sure the mapping, including its order, and scores are the same.
+    assert mapping0 == mapping1
+    assert list(mapping0.items()) == list(mapping1.items())
+    assert scores0.angstroms().value() == pytest.approx(scores1.angstroms().value())
+
+
+def test_mapping_cache_corrupt(molecule0, molecule1, monkeypatch, tmp_path):
+    # Enable the on-disk mapping cache, using a temporary directory.
+    monkeypatch.setenv("BSS_CACHE_ALIGN", "1")
+    monkeypatch.setattr(BSS.Align._align, "_mapping_cache_dir", str(tmp_path))
+
+    # Generate the mapping, which will be written to the cache.
+    mapping0 = BSS.Align.matchAtoms(molecule0, molecule1, timeout=BSS.Units.Time.second)
+
+    # Corrupt the cache file.
+    (cache_file,) = tmp_path.glob("*.json")
+    cache_file.write_text("{")
+
+    # A corrupt cache file should be treated as a cache miss.
+    mapping1 = BSS.Align.matchAtoms(molecule0, molecule1, timeout=BSS.Units.Time.second)
+
+    assert mapping0 == mapping1
+
+
+def test_merge(ligand31_38):
+    # Get the ligands and the best mapping between them.
+    m0, m1, mapping = ligand31_38
 
     # Align m0 to m1 based on the mapping.
     m0 = BSS.Align.rmsdAlign(m0, m1, mapping)
@@ -153,8 +217,7 @@ def test_merge():
     # the merged molecule.
     selection = m2._sire_object.selection()
     selection.deselectAll()
-    for atom in m0._sire_object.atoms():
-        selection.select(atom.index())
+    selection.select([AtomIdx(idx) for idx in range(n0)])
     partial_mol = PartialMolecule(m2._sire_object, selection)
 
     internalff2 = InternalFF("internal")
@@ -176,10 +239,8 @@ def test_merge():
     # the merged molecule.
     selection = m2._sire_object.selection()
     selection.deselectAll()
-    for idx in mapping.keys():
-        selection.select(AtomIdx(idx))
-    for idx in range(n0, m2._sire_object.nAtoms()):
-        selection.select(AtomIdx(idx))
+    indices = list(mapping.keys()) + list(range(n0, m2._sire_object.nAtoms()))
+    selection.select([AtomIdx(idx) for idx in indices])
     partial_mol = PartialMolecule(m2._sire_object, selection)
 
     internalff2 = InternalFF("internal")
@@ -201,14 +262,10 @@ def test_merge():
 @pytest.mark.xfail(
     reason="Mapping generated with latest RDKit which requires sanitization no longer triggers the exception"
 )
-def test_ring_breaking_three_membered():
+def test_ring_breaking_three_membered(ligand_cache):
     # Load the ligands.
-    s0 = BSS.IO.readMolecules([f"{url}/CAT-13a.prm7.bz2", f"{url}/CAT-13a.rst7.bz2"])
-    s1 = BSS.IO.readMolecules([f"{url}/CAT-17g.prm7.bz2", f"{url}/CAT-17g.rst7.bz2"])
-
-    # Extract the molecules.
-    m0 = s0.getMolecules()[0]
-    m1 = s1.getMolecules()[0]
+    m0 = ligand_cache("CAT-13a")
+    m1 = ligand_cache("CAT-17g")
 
     # Generate the mapping.
     mapping = BSS.Align.matchAtoms(m0, m1)
@@ -227,14 +284,10 @@ def test_ring_breaking_three_membered():
 @pytest.mark.xfail(
     reason="Mapping generated with latest RDKit which requires sanitization no longer triggers the exception"
 )
-def test_ring_breaking_five_membered():
+def test_ring_breaking_five_membered(ligand_cache):
     # Load the ligands.
-    s0 = BSS.IO.readMolecules([f"{url}/ligand31.prm7.bz2", f"{url}/ligand31.rst7.bz2"])
-    s1 = BSS.IO.readMolecules([f"{url}/ligand04.prm7.bz2", f"{url}/ligand04.rst7.bz2"])
-
-    # Extract the molecules.
-    m0 = s0.getMolecules()[0]
-    m1 = s1.getMolecules()[0]
+    m0 = ligand_cache("ligand31")
+    m1 = ligand_cache("ligand04")
 
     # Load the pre-defined mapping.
     mapping = BSS.Align.matchAtoms(m0, m1)
@@ -253,16 +306,12 @@ def test_ring_breaking_five_membered():
 @pytest.mark.xfail(
     reason="Mapping generated with latest RDKit which requires sanitization no longer triggers the exception"
 )
-def test_ring_breaking_six_membered():
+def test_ring_breaking_six_membered(ligand_cache):
     # Load the ligands.
-    s0 = BSS.IO.readMolecules([f"{url}/ligand31.prm7.bz2", f"{url}/ligand31.rst7.bz2"])
-    s1 = BSS.IO.readMolecules([f"{url}/ligand38.prm7.bz2", f"{url}/ligand38.rst7.bz2"])
-
-    # Extract the molecules.
-    m0 = s0.getMolecules()[0]
-    m1 = s1.getMolecules()[0]
+    m0 = ligand_cache("ligand31")
+    m1 = ligand_cache("ligand38")
 
-    # Load the pre-defined mapping.
+    # Get the best mapping between the molecules, using the default timeout.
     mapping = BSS.Align.matchAtoms(m0, m1)
 
     # Align m0 to m1 based on the mapping.
@@ -293,18 +342,10 @@ def test_ring_breaking_six_membered():
         ),
     ],
 )
-def test_ring_size_change(ligands):
+def test_ring_size_change(ligand_cache, ligands):
     # Load the ligands.
-    s0 = BSS.IO.readMolecules(
-        [f"{url}/{ligands[0]}.prm7.bz2", f"{url}/{ligands[0]}.rst7.bz2"]
-    )
-    s1 = BSS.IO.readMolecules(
-        [f"{url}/{ligands[1]}.prm7.bz2", f"{url}/{ligands[1]}.rst7.bz2"]
-    )
-
-    # Extract the molecules.
-    m0 = s0.getMolecules()[0]
-    m1 = s1.getMolecules()[0]
+    m0 = ligand_cache(ligands[0])
+    m1 = ligand_cache(ligands[1])
 
     # Generate the mapping.
     mapping = BSS.Align.matchAtoms(m0, m1)
@@ -377,18 +418,10 @@ def test_ring_size_change(ligands):
         ),
     ],
 )
-def test_grow_whole_ring(ligands, mapping):
+def test_grow_whole_ring(ligand_cache, ligands, mapping):
     # Load the ligands.
-    s0 = BSS.IO.readMolecules(
-        [f"{url}/{ligands[0]}.prm7.bz2", f"{url}/{ligands[0]}.rst7.bz2"]
-    )
-    s1 = BSS.IO.readMolecules(
-        [f"{url}/{ligands[1]}.prm7.bz2", f"{url}/{ligands[1]}.rst7.bz2"]
-    )
-
-    # Extract the molecules.
-    m0 = s0.getMolecules()[0]
-    m1 = s1.getMolecules()[0]
+    m0 = ligand_cache(ligands[0])
+    m1 = ligand_cache(ligands[1])
 
     # Align m0 to m1 based on the mapping.
     m0 = BSS.Align.rmsdAlign(m0, m1, mapping)
@@ -397,17 +430,9 @@ def test_grow_whole_ring(ligands, mapping):
     m2 = BSS.Align.merge(m0, m1, mapping)
 
 
-def test_hydrogen_mass_repartitioning():
-    # Load the ligands.
-    s0 = BSS.IO.readMolecules([f"{url}/ligand31.prm7.bz2", f"{url}/ligand31.rst7.bz2"])
-    s1 = BSS.IO.readMolecules([f"{url}/ligand38.prm7.bz2", f"{url}/ligand38.rst7.bz2"])
-
-    # Extract the molecules.
-    m0 = s0.getMolecules()[0]
-    m1 = s1.getMolecules()[0]
-
-    # Get the best mapping between the molecules.
-    mapping = BSS.Align.matchAtoms(m0, m1, timeout=BSS.Units.Time.second)
+def test_hydrogen_mass_repartitioning(ligand31_38):
+    # Get the ligands and the best mapping between them.
+    m0, m1, mapping = ligand31_38
 
     # Align m0 to m1 based on the mapping.
     m0 = BSS.Align.rmsdAlign(m0, m1, mapping)
@@ -418,51 +443,38 @@ def test_hydrogen_mass_repartitioning():
     # Create a dummy element.
     dummy = Element("Xx")
 
-    # Get the elements in either end state.
+    # Get the elements in either end state and flag the dummy atoms.
     elements0 = merged._sire_object.property("element0").toVector()
     elements1 = merged._sire_object.property("element1").toVector()
+    is_dummy0 = np.fromiter((e == dummy for e in elements0), dtype=bool)
+    is_dummy1 = np.fromiter((e == dummy for e in elements1), dtype=bool)
+
+    def get_masses(prop):
+        """Return the masses for an end state as a NumPy array."""
+        return np.fromiter(
+            (m.value() for m in merged._sire_object.property(prop).toVector()),
+            dtype=np.float64,
+        )
 
     # Work out the initial mass of the system.
-    initial_mass0 = 0
-    for idx, mass in enumerate(merged._sire_object.property("mass0").toVector()):
-        if elements0[idx] != dummy:
-            initial_mass0 += mass.value()
-    initial_mass1 = 0
-    for idx, mass in enumerate(merged._sire_object.property("mass1").toVector()):
-        if elements1[idx] != dummy:
-            initial_mass1 += mass.value()
+    initial_mass0 = get_masses("mass0")[~is_dummy0].sum()
+    initial_mass1 = get_masses("mass1")[~is_dummy1].sum()
 
     # Repartition the hydrogen mass.
     merged.repartitionHydrogenMass()
 
-    # Lists to store the mass of dummy atoms in the two end states.
-    dummy_masses0 = []
-    dummy_masses1 = []
-
     # Extract the modified end state masses.
-    masses0 = merged._sire_object.property("mass0").toVector()
-    masses1 = merged._sire_object.property("mass1").toVector()
+    masses0 = get_masses("mass0")
+    masses1 = get_masses("mass1")
 
     # Work out the final mass of the system.
-    final_mass0 = 0
-    for idx, mass in enumerate(masses0):
-        if elements0[idx] != dummy:
-            final_mass0 += mass.value()
-        else:
-            dummy_masses0.append((idx, mass))
-    final_mass1 = 0
-    for idx, mass in enumerate(masses1):
-        if elements1[idx] != dummy:
-            final_mass1 += mass.value()
-        else:
-            dummy_masses1.append((idx, mass))
+    final_mass0 = masses0[~is_dummy0].sum()
+    final_mass1 = masses1[~is_dummy1].sum()
 
     # Assert the the masses are approximately the same.
     assert final_mass0 == pytest.approx(initial_mass0)
     assert final_mass1 == pytest.approx(initial_mass1)
 
     # Assert that the dummy atom masses are the same in both end states.
-    for idx, mass0 in dummy_masses0:
-        assert mass0 == masses1[idx]
-    for idx, mass1 in dummy_masses1:
-        assert mass1 == masses0[idx]
+    assert np.array_equal(masses0[is_dummy0], masses1[is_dummy0])
+    assert np.array_equal(masses1[is_dummy1], masses0[is_dummy1])
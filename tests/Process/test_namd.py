@@ -1,8 +1,10 @@
+import os
+
 import pytest
 
 import BioSimSpace as BSS
 
-from tests.conftest import url, has_namd
+from tests.conftest import url, has_mdanalysis, has_namd
 
 # Store the allowed restraints.
 restraints = BSS.Protocol._position_restraint_mixin._PositionRestraintMixin.restraints()
@@ -20,6 +22,19 @@ def system():
     )
 
 
+@pytest.fixture(scope="session")
+def velocity_system():
+    """A system with velocities, taken from the first frame of a trajectory."""
+    system = BSS.IO.readMolecules(["tests/input/ala.top", "tests/input/ala.crd"])
+    traj = BSS.Trajectory.Trajectory(
+        trajectory="tests/input/ala.trr",
+        topology="tests/input/ala.tpr",
+        system=system,
+        backend="MDANALYSIS",
+    )
+    return traj.getFrames([0])[0]
+
+
 @pytest.mark.skipif(has_namd is False, reason="Requires NAMD to be installed.")
 @pytest.mark.parametrize("restraint", restraints)
 def test_minimise(system, restraint):
@@ -90,6 +105,157 @@ def test_production(system, restraint):
     run_process(system, protocol)
 
 
+def test_config(system, tmp_path):
+    """Test the configuration and input files generated without velocities."""
+
+    # Create a dummy executable, since the process is never run.
+    exe = tmp_path / "namd2"
+    exe.touch()
+
+    # Initialise the NAMD process.
+    process = BSS.Process.Namd(
+        system,
+        BSS.Protocol.Minimisation(steps=100),
+        exe=str(exe),
+        name="test",
+        work_dir=str(tmp_path / "work"),
+    )
+
+    # Check the input files.
+    check_input_files(process, has_velocities=False)
+
+
+@pytest.mark.skipif(
+    has_mdanalysis is False, reason="Requires MDAnalysis to be installed."
+)
+def test_config_velocities(velocity_system, tmp_path):
+    """Test the configuration and input files generated with velocities."""
+
+    # Create a dummy executable, since the process is never run.
+    exe = tmp_path / "namd2"
+    exe.touch()
+
+    # Initialise the NAMD process.
+    process = BSS.Process.Namd(
+        velocity_system,
+        BSS.Protocol.Minimisation(steps=100),
+        exe=str(exe),
+        name="test",
+        work_dir=str(tmp_path / "work"),
+    )
+
+    # Check the input files.
+    check_input_files(process, has_velocities=True)
+
+    # Reset the configuration and make sure the velocities are still used.
+    process.resetConfig()
+    check_input_files(process, has_velocities=True)
+
+
+def test_input_file_cache(system, tmp_path, monkeypatch):
+    """Test that input files are re-used when the same system is set up again."""
+
+    # Create a dummy executable, since the process is never run.
+    exe = tmp_path / "namd2"
+    exe.touch()
+
+    # Create a process, which will add the input files to the cache.
+    protocol = BSS.Protocol.Minimisation(steps=100)
+    process0 = BSS.Process.Namd(
+        system, protocol, exe=str(exe), name="test", work_dir=str(tmp_path / "work0")
+    )
+
+    # Make sure that the input files can't be written again, so that the
+    # second process must re-use them from the cache.
+    def fail(*args, **kwargs):
+        raise AssertionError("The input files weren't re-used from the cache.")
+
+    monkeypatch.setattr(BSS.Process._namd._IO, "saveMolecules", fail)
+    monkeypatch.setattr(BSS.Process._namd._SireIO, "PDB2", fail)
+
+    # Create a second process in a different working directory.
+    process1 = BSS.Process.Namd(
+        system, protocol, exe=str(exe), name="test", work_dir=str(tmp_path / "work1")
+    )
+
+    # Check the input files.
+    check_input_files(process1, has_velocities=False)
+
+    # Make sure the cached input files match the originals.
+    for file0, file1 in zip(process0.inputFiles(), process1.inputFiles()):
+        with open(file0) as f0, open(file1) as f1:
+            assert f0.read() == f1.read()
+
+
+@pytest.mark.skipif(
+    has_mdanalysis is False, reason="Requires MDAnalysis to be installed."
+)
+def test_input_file_cache_velocities(velocity_system, tmp_path, monkeypatch):
+    """Test that a velocity file is still written when input files are re-used."""
+
+    # Create a dummy executable, since the process is never run.
+    exe = tmp_path / "namd2"
+    exe.touch()
+
+    # Create a process, which will add the input files to the cache.
+    protocol = BSS.Protocol.Minimisation(steps=100)
+    process = BSS.Process.Namd(
+        velocity_system,
+        protocol,
+        exe=str(exe),
+        name="test",
+        work_dir=str(tmp_path / "work0"),
+    )
+
+    # Make sure that the PSF file can't be written again, so that the second
+    # process must re-use it from the cache.
+    def fail(*args, **kwargs):
+        raise AssertionError("The PSF file wasn't re-used from the cache.")
+
+    monkeypatch.setattr(BSS.Process._namd._IO, "saveMolecules", fail)
+
+    # Create a second process in a different working directory.
+    process = BSS.Process.Namd(
+        velocity_system,
+        protocol,
+        exe=str(exe),
+        name="test",
+        work_dir=str(tmp_path / "work1"),
+    )
+
+    # Check the input files. The velocity file must have been written.
+    check_input_files(process, has_velocities=True)
+
+
+def check_input_files(process, has_velocities):
+    """Helper function to check the configuration and input files."""
+
+    # Get the configuration and the names of the input files.
+    config = process.getConfig()
+    input_files = [os.path.basename(file) for file in process.inputFiles()]
+
+    # Make sure that all input files were written.
+    for file in process.inputFiles():
+        assert os.path.isfile(file)
+
+    # Make sure the topology and coordinates are referenced.
+    assert "structure             test.psf" in config
+    assert "coordinates           test.pdb" in config
+
+    # Check the velocity file and configuration entry.
+    velocities = "velocities            test.vel"
+    if has_velocities:
+        assert "test.vel" in input_files
+        assert config[config.index("coordinates           test.pdb") + 1] == velocities
+    else:
+        assert "test.vel" not in input_files
+        assert velocities not in config
+
+    # Make sure the configuration file on disk matches.
+    with open(os.path.join(process.workDir(), "test.cfg")) as file:
+        assert file.read().splitlines() == config
+
+
 def run_process(system, protocol):
     """Helper function to run various simulation protocols."""
 
@@ -1,6 +1,7 @@
 collect_ignore_glob = ["*/out_test*.py"]
 
 import os
+import urllib.request
 
 import BioSimSpace as BSS
 
@@ -9,6 +10,47 @@ from BioSimSpace._Utils import _try_import, _have_imported
 # Store the tutorial URL.
 url = BSS.tutorialUrl()
 
+# The directory used to cache files downloaded from the tutorial URL.
+tutorial_cache_dir = os.path.join(
+    os.path.expanduser("~"), ".cache", "BioSimSpace", "tutorial"
+)
+
+
+def _ensure_local(path):
+    """
+    Return a local path for a tutorial file, downloading it only once.
+
+    BSS.IO.readMolecules has a 'download_dir' option, but it doesn't
+    guarantee that files already in the directory are re-used, so the
+    files are downloaded into a persistent cache here instead.
+    """
+    if not path.startswith(url):
+        return path
+
+    local_path = os.path.join(tutorial_cache_dir, os.path.basename(path))
+
+    if not os.path.isfile(local_path):
+        os.makedirs(tutorial_cache_dir, exist_ok=True)
+        # Download to a temporary file, then move into place, so that
+        # concurrent test sessions never see a partially written file.
+        # HTTP errors and truncated downloads raise, in which case the
+        # temporary file is removed and nothing is cached.
+        tmp_path = "%s.%d.tmp" % (local_path, os.getpid())
+        try:
+            urllib.request.urlretrieve(path, tmp_path)
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return local_path
+
+
+def read_molecules(files, **kwargs):
+    """Read molecules, using locally cached copies of any tutorial files."""
+    return BSS.IO.readMolecules([_ensure_local(file) for file in files], **kwargs)
+
+
 # Make sure GROMACS is installed.
 has_gromacs = BSS._gmx_exe is not None
 